@@ -4,22 +4,85 @@ Benchmark WSInfer performance across different configurations.
 
 Usage:
     python benchmark_wsinfer.py --wsi-dir slides/ --output benchmark_results.json
+
+Results are streamed to the output file as each run finishes. The full stdout and
+stderr of every run are saved in a sibling ``<output>_logs/`` directory.
 """
 
 import argparse
-import json
+import asyncio
+import contextlib
+import functools
+import hashlib
+import importlib.metadata
+import os
+import re
+import shutil
+import signal
+import socket
+import statistics
 import time
-import subprocess
 import sys
 from pathlib import Path
-from typing import Dict, List, Any
+from typing import Callable, Dict, List, Any, Optional, Tuple
 import platform
-import torch
+import numpy as np
+import psutil
+
+from monitor_resources import ResourceMonitor, analyze_timeline, json_dumps, json_loads
+
+_SYSINFO_CACHE = Path.home() / ".cache" / "wsinfer_bench" / "sysinfo.json"
+# Relative slowdown over the best time seen so far that prunes the rest of a sweep.
+_REGRESSION_TOLERANCE = 1.10
+_CUDA_ERROR_PATTERN = re.compile(r"CUDA out of memory|CUDA error")
+# Stop adding workers once fewer than this fraction of them keep a core busy.
+_MIN_BUSY_WORKER_FRACTION = 0.5
+# A run is GPU-starved when, in more than this fraction of progress updates, the wait
+# on the data loader is over half the time per batch.
+_STARVED_FRACTION = 0.1
+# tqdm progress of the inference loop in `wsinfer run`, e.g. "4.50it/s, data_time=0.0123]".
+# Requiring data_time skips other bars, like the per-slide one of the GeoJSON export.
+_PROGRESS_PATTERN = re.compile(rb"(\d+(?:\.\d+)?)(it/s|s/it), data_time=(\d+(?:\.\d+)?)\]")
+# Repeated runs whose median absolute deviation exceeds this fraction of the median
+# are reported as noisy.
+_NOISY_MAD_FRACTION = 0.05
+# Default batch sizes; sizes that do not fit in GPU memory are dropped by a probe.
+_DEFAULT_BATCH_SIZES = [8, 16, 32, 64, 128]
+_READ_CHUNK_BYTES = 16 * 1024**2
+# Bytes of stdout/stderr kept in the JSON record; the full output goes to a log file.
+_LOG_TAIL_BYTES = 4096
 
 
 def get_system_info() -> Dict[str, Any]:
-    """Get system information for benchmarking context."""
-    return {
+    """Get system information for benchmarking context.
+
+    Probing the devices needs torch, which is slow to import, so the result is
+    cached on disk and reused until the machine reboots or the interpreter, the
+    installed torch version or the visible GPUs change.
+    """
+    try:
+        # Read from the package metadata, which does not import torch.
+        torch_version = importlib.metadata.version("torch")
+    except importlib.metadata.PackageNotFoundError:
+        torch_version = ""
+    key = hashlib.blake2b("|".join([
+        socket.gethostname(),
+        platform.release(),
+        str(psutil.boot_time()),
+        sys.executable,
+        torch_version,
+        os.environ.get("CUDA_VISIBLE_DEVICES", ""),
+    ]).encode()).hexdigest()[:16]
+    try:
+        cached = json_loads(_SYSINFO_CACHE.read_bytes())
+        if cached["key"] == key:
+            return cached["info"]
+    except (OSError, ValueError, KeyError):
+        pass
+
+    import torch
+
+    info = {
         "platform": platform.platform(),
         "python_version": platform.python_version(),
         "pytorch_version": torch.__version__,
@@ -27,62 +90,814 @@ def get_system_info() -> Dict[str, Any]:
         "cuda_device_count": torch.cuda.device_count() if torch.cuda.is_available() else 0,
         "mps_available": torch.backends.mps.is_available() if hasattr(torch.backends, 'mps') else False,
     }
+    try:
+        _SYSINFO_CACHE.parent.mkdir(parents=True, exist_ok=True)
+        _SYSINFO_CACHE.write_bytes(json_dumps({"key": key, "info": info}))
+    except OSError:
+        pass
+    return info
+
+
+# Per-result fields kept as parallel columns, with their NumPy dtypes.
+_COLUMN_DTYPES = {
+    "name": object,
+    "model": object,
+    "batch_size": np.int32,
+    "num_workers": np.int32,
+    "speedup": bool,
+    "pin_memory": bool,
+    "prefetch_factor": np.int32,
+    "execution_time": np.float32,
+    "it_per_s": np.float32,
+    "patches_per_s": np.float32,
+    "success": bool,
+}
+
+
+class ResultWriter:
+    """Stream benchmark results into a JSON document as they complete.
+
+    The header is written up front and each result is appended to the ``results``
+    array and flushed, so memory stays flat over long sweeps and a crash only loses
+    the run in progress. The scalar fields of every result are also collected as
+    parallel columns, written as a ``columns`` object after the results so that
+    consumers can load them without walking every record.
+    """
+
+    def __init__(self, path: Path, header: Dict[str, Any]):
+        self._f = open(path, "wb")
+        self._count = 0
+        self.columns: Dict[str, List[Any]] = {key: [] for key in _COLUMN_DTYPES}
+        self._f.write(b"{\n")
+        for key, value in header.items():
+            self._f.write(json_dumps(key) + b": " + json_dumps(value) + b",\n")
+        self._f.write(b'"results": [\n')
+        self._f.flush()
+
+    def write(self, result: Dict[str, Any]) -> None:
+        if self._count:
+            self._f.write(b",\n")
+        self._f.write(json_dumps(result))
+        self._f.flush()
+        self._count += 1
+
+        config = result["config"]
+        for key in ("name", "model", "batch_size", "num_workers", "speedup"):
+            self.columns[key].append(config[key])
+        self.columns["pin_memory"].append(config.get("pin_memory", False))
+        self.columns["prefetch_factor"].append(config.get("prefetch_factor", 2))
+        self.columns["execution_time"].append(result["execution_time_seconds"])
+        it_per_s = result.get("it_per_s_median")
+        self.columns["it_per_s"].append(it_per_s)
+        # One iteration is one batch, so batches per second only compare across
+        # runs with the same batch size.
+        self.columns["patches_per_s"].append(
+            None if it_per_s is None else it_per_s * config["batch_size"]
+        )
+        self.columns["success"].append(result["success"])
+
+    def arrays(self) -> Dict[str, np.ndarray]:
+        """Return the collected columns as NumPy arrays; missing throughput is NaN."""
+        arrays = {}
+        for key, dtype in _COLUMN_DTYPES.items():
+            values = self.columns[key]
+            if key in ("it_per_s", "patches_per_s"):
+                values = [np.nan if v is None else v for v in values]
+            arrays[key] = np.array(values, dtype=dtype)
+        return arrays
+
+    def close(self) -> None:
+        self._f.write(b'\n],\n"columns": ')
+        self._f.write(json_dumps(self.columns))
+        self._f.write(b"}\n")
+        self._f.close()
+
+    def __enter__(self) -> "ResultWriter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def write_parquet(columns: Dict[str, np.ndarray], path: Path) -> bool:
+    """Write result columns to a Parquet file if pyarrow is installed."""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        return False
+    pq.write_table(pa.Table.from_pydict(columns), path)
+    return True
+
+
+def _read_tail(path: Path) -> str:
+    """Return the last few kilobytes of a log file, decoded."""
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        f.seek(max(f.tell() - _LOG_TAIL_BYTES, 0))
+        return f.read().decode(errors="replace")
+
+
+def parse_progress(path: Path) -> Dict[str, float]:
+    """Summarize throughput from the inference progress bars in a wsinfer log file.
+
+    Each tqdm redraw (roughly every 0.1 s) is one progress update. Returns the
+    median iterations (batches) per second, the median time spent waiting on the
+    data loader, and the fraction of progress updates where that wait was more than
+    half the time per batch.
+    """
+    matches = _PROGRESS_PATTERN.findall(path.read_bytes())
+    if not matches:
+        return {}
+    # tqdm switches to seconds per iteration when a batch takes over a second.
+    rates = np.fromiter(
+        (float(value) if unit == b"it/s" else 1 / max(float(value), 1e-9)
+         for value, unit, _ in matches),
+        dtype=np.float64,
+        count=len(matches),
+    )
+    data_times = np.fromiter(
+        (float(data_time) for _, _, data_time in matches),
+        dtype=np.float64,
+        count=len(matches),
+    )
+    valid = rates > 0
+    if not valid.any():
+        return {}
+    rates, data_times = rates[valid], data_times[valid]
+    return {
+        "it_per_s_median": float(np.median(rates)),
+        "data_time_median": float(np.median(data_times)),
+        "gpu_starved_fraction": float((data_times > 0.5 / rates).mean()),
+    }
+
+
+def _exit_code(status: int) -> int:
+    """Convert a waitpid() status into a return code like ``Popen.returncode``."""
+    if os.WIFSIGNALED(status):
+        return -os.WTERMSIG(status)
+    return os.WEXITSTATUS(status)
+
+
+async def _run_process(
+    cmd: List[str],
+    env: Dict[str, str],
+    stdout_f,
+    stderr_f,
+    timeout: Optional[float],
+    on_spawn: Optional[Callable[[int], None]] = None,
+) -> Tuple[int, bool]:
+    """Run ``cmd`` with its output redirected to open files.
 
+    ``posix_spawn`` avoids forking the driver (and everything it has imported) and
+    the output never passes through a pipe in this process. ``on_spawn`` is called
+    with the child's pid. Returns the return code and whether the run was killed
+    for exceeding ``timeout``.
+    """
+    if not hasattr(os, "posix_spawnp"):
+        proc = await asyncio.create_subprocess_exec(*cmd, stdout=stdout_f, stderr=stderr_f, env=env)
+        if on_spawn is not None:
+            on_spawn(proc.pid)
+        try:
+            await asyncio.wait_for(proc.wait(), timeout=timeout)
+            return proc.returncode, False
+        except asyncio.TimeoutError:
+            proc.kill()
+            await proc.wait()
+            return proc.returncode, True
 
-def run_benchmark(wsi_dir: Path, results_dir: Path, config: Dict[str, Any]) -> Dict[str, Any]:
-    """Run a single benchmark with given configuration."""
+    pid = os.posix_spawnp(cmd[0], cmd, env, file_actions=[
+        (os.POSIX_SPAWN_DUP2, stdout_f.fileno(), 1),
+        (os.POSIX_SPAWN_DUP2, stderr_f.fileno(), 2),
+    ])
+    if on_spawn is not None:
+        on_spawn(pid)
+    # Shield the wait so a timeout does not abandon the child before it is reaped.
+    wait = asyncio.get_running_loop().run_in_executor(None, os.waitpid, pid, 0)
+    try:
+        _, status = await asyncio.wait_for(asyncio.shield(wait), timeout=timeout)
+        return _exit_code(status), False
+    except asyncio.TimeoutError:
+        os.kill(pid, signal.SIGKILL)
+        _, status = await wait
+        return _exit_code(status), True
+
+
+class DevicePool:
+    """Bound the number of concurrent runs and hand out devices round-robin.
+
+    With ``pin_gpus`` each slot is one CUDA device and runs get ``CUDA_VISIBLE_DEVICES``
+    set to that device, taken from the caller's ``CUDA_VISIBLE_DEVICES`` if it is set.
+    Otherwise the slots are interchangeable (CPU-only runs, or a single run that sees
+    every GPU).
+    """
+
+    def __init__(self, slots: int, pin_gpus: bool = False):
+        self.pin_gpus = pin_gpus
+        self.slots = max(slots, 1)
+        self._queue: "asyncio.Queue[Optional[str]]" = asyncio.Queue()
+        # The child's mask replaces the caller's, and torch counts devices within the
+        # caller's mask, so pin to its entries instead of to indices into it.
+        visible = os.environ.get("CUDA_VISIBLE_DEVICES", "")
+        devices = [d.strip() for d in visible.split(",") if d.strip()]
+        for i in range(self.slots):
+            if not pin_gpus:
+                self._queue.put_nowait(None)
+            else:
+                self._queue.put_nowait(devices[i] if i < len(devices) else str(i))
+
+    @contextlib.asynccontextmanager
+    async def acquire(self):
+        """Wait for a free slot and yield the environment for the child process."""
+        device = await self._queue.get()
+        try:
+            env = dict(os.environ)
+            if device is not None:
+                env["CUDA_VISIBLE_DEVICES"] = device
+            yield env
+        finally:
+            self._queue.put_nowait(device)
+
+
+# Positions of the per-run values in the argv from _command_template().
+_WSI_DIR_SLOT, _RESULTS_DIR_SLOT, _BATCH_SIZE_SLOT, _NUM_WORKERS_SLOT = 3, 5, 9, 11
+# Data loader defaults of `wsinfer run`. The options are only passed when a run
+# differs from them, since released wsinfer versions do not have them.
+_DEFAULT_PIN_MEMORY = False
+_DEFAULT_PREFETCH_FACTOR = 2
+
+
+@functools.lru_cache(maxsize=None)
+def _command_template(model: str, speedup: bool) -> Tuple[Optional[str], ...]:
+    """Build the `wsinfer run` argv shared by a search, with per-run slots left as None."""
+    return (
+        "wsinfer", "run",
+        "--wsi-dir", None,
+        "--results-dir", None,
+        "--model", model,
+        "--batch-size", None,
+        "--num-workers", None,
+        "--speedup" if speedup else "--no-speedup",
+    )
+
+
+async def run_benchmark(
+    wsi_dir: Path,
+    results_dir: Path,
+    config: Dict[str, Any],
+    log_dir: Path,
+    env: Optional[Dict[str, str]] = None,
+    timeout: Optional[float] = None,
+    monitor_interval: Optional[float] = None,
+) -> Dict[str, Any]:
+    """Run a single benchmark with given configuration.
+
+    The full stdout and stderr are saved under ``log_dir``; the result keeps only
+    their last few kilobytes. Throughput parsed from wsinfer's progress output is
+    added to the result (see :func:`parse_progress`). With ``monitor_interval``,
+    system usage is sampled during the run and summarized in
+    ``result["resource_analysis"]``.
+    """
     
     # Clean results directory for this run
     run_results_dir = results_dir / f"run_{config['name']}"
     if run_results_dir.exists():
-        import shutil
         shutil.rmtree(run_results_dir)
     
-    # Build command
-    cmd = [
-        "wsinfer", "run",
-        "--wsi-dir", str(wsi_dir),
-        "--results-dir", str(run_results_dir),
-        "--model", config["model"],
-        "--batch-size", str(config["batch_size"]),
-        "--num-workers", str(config["num_workers"]),
-    ]
-    
-    if config.get("speedup", False):
-        cmd.append("--speedup")
-    else:
-        cmd.append("--no-speedup")
+    cmd = list(_command_template(config["model"], config.get("speedup", False)))
+    cmd[_WSI_DIR_SLOT] = str(wsi_dir)
+    cmd[_RESULTS_DIR_SLOT] = str(run_results_dir)
+    cmd[_BATCH_SIZE_SLOT] = str(config["batch_size"])
+    cmd[_NUM_WORKERS_SLOT] = str(config["num_workers"])
+    if config.get("pin_memory", _DEFAULT_PIN_MEMORY) != _DEFAULT_PIN_MEMORY:
+        cmd.append("--pin-memory")
+    prefetch_factor = config.get("prefetch_factor", _DEFAULT_PREFETCH_FACTOR)
+    if prefetch_factor != _DEFAULT_PREFETCH_FACTOR:
+        cmd += ["--prefetch-factor", str(prefetch_factor)]
     
-    print(f"Running benchmark: {config['name']}")
+    device = (env or {}).get("CUDA_VISIBLE_DEVICES")
+    print(f"Running benchmark: {config['name']}" + (f" (GPU {device})" if device else ""))
     print(f"Command: {' '.join(cmd)}")
     
+    monitor = None
+    if monitor_interval:
+        monitor = ResourceMonitor(interval=monitor_interval, max_duration_s=timeout or 24 * 3600)
+        # The sampler is a fresh interpreter that takes a while to import its modules;
+        # wait for it off the event loop so concurrent runs keep being timed.
+        await asyncio.get_running_loop().run_in_executor(None, monitor.start_monitoring)
+    stdout_log = log_dir / f"{config['name']}.stdout.log"
+    stderr_log = log_dir / f"{config['name']}.stderr.log"
     start_time = time.perf_counter()
-    try:
-        result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-        end_time = time.perf_counter()
-        
-        execution_time = end_time - start_time
-        
-        return {
-            "config": config,
-            "execution_time_seconds": execution_time,
-            "success": True,
-            "stdout": result.stdout,
-            "stderr": result.stderr,
-        }
-        
-    except subprocess.CalledProcessError as e:
-        end_time = time.perf_counter()
-        execution_time = end_time - start_time
-        
-        return {
-            "config": config,
-            "execution_time_seconds": execution_time,
-            "success": False,
-            "stdout": e.stdout,
-            "stderr": e.stderr,
-            "return_code": e.returncode,
-        }
+    with open(stdout_log, "wb") as stdout_f, open(stderr_log, "wb") as stderr_f:
+        return_code, timed_out = await _run_process(
+            cmd, env or dict(os.environ), stdout_f, stderr_f, timeout,
+            on_spawn=monitor.track_process if monitor is not None else None,
+        )
+    execution_time = time.perf_counter() - start_time
+    if monitor is not None:
+        # Joining the sampler process can take up to one interval.
+        timeline = await asyncio.get_running_loop().run_in_executor(None, monitor.stop_monitoring)
+
+    result = {
+        "config": config,
+        "execution_time_seconds": execution_time,
+        "success": return_code == 0 and not timed_out,
+        "stdout": _read_tail(stdout_log),
+        "stderr": _read_tail(stderr_log),
+        "stdout_log": str(stdout_log),
+        "stderr_log": str(stderr_log),
+    }
+    if not result["success"]:
+        result["return_code"] = return_code
+    if timed_out:
+        result["timed_out"] = True
+    result.update(parse_progress(stderr_log))
+    if monitor is not None:
+        result["resource_analysis"] = analyze_timeline(timeline)
+        result["resource_analysis"]["skipped_deadlines"] = monitor.skipped_deadlines
+    return result
+
+
+# Whole slide image formats read by OpenSlide or tifffile, used to pick a probe slide.
+_SLIDE_SUFFIXES = {".svs", ".tif", ".tiff", ".ndpi", ".vms", ".vmu", ".scn", ".mrxs", ".svslide", ".bif"}
+
+
+def _wsinfer_slides(wsi_dir: Path) -> List[Path]:
+    """List the files `wsinfer run` treats as slides: every file at the top level."""
+    return sorted(p for p in wsi_dir.iterdir() if p.is_file())
+
+
+def _slide_size(slide: Path) -> int:
+    """Bytes of a slide, including the data directory that MIRAX keeps next to it."""
+    data_dir = slide.with_suffix("")
+    extra = sum(p.stat().st_size for p in _slide_files(data_dir)) if data_dir.is_dir() else 0
+    return slide.stat().st_size + extra
+
+
+def _pick_probe_slide(wsi_dir: Path) -> Path:
+    """Pick the smallest slide of ``wsi_dir``, preferring known slide formats."""
+    slides = _wsinfer_slides(wsi_dir)
+    if not slides:
+        raise FileNotFoundError(f"No slides found in {wsi_dir}")
+    known = [p for p in slides if p.suffix.lower() in _SLIDE_SUFFIXES]
+    return min(known or slides, key=_slide_size)
+
+
+def _slide_files(wsi_dir: Path) -> List[Path]:
+    # Every file, so formats with companion data (e.g. MIRAX .mrxs + .dat) are covered.
+    return [p for p in sorted(wsi_dir.rglob("*")) if p.is_file()]
+
+
+def warm_page_cache(wsi_dir: Path) -> Dict[str, int]:
+    """Read every file under ``wsi_dir`` once so timed runs do not hit cold disk.
+
+    Returns the bytes read and the system page cache size before and after, or None
+    for the cache size where psutil does not report it (macOS, Windows).
+    """
+    cached_before = getattr(psutil.virtual_memory(), "cached", None)
+    buf = bytearray(_READ_CHUNK_BYTES)
+    total = 0
+    for path in _slide_files(wsi_dir):
+        with open(path, "rb", buffering=0) as f:
+            if hasattr(os, "posix_fadvise"):
+                os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_WILLNEED)
+            while n := f.readinto(buf):
+                total += n
+    return {
+        "bytes_read": total,
+        "cached_before": cached_before,
+        "cached_after": getattr(psutil.virtual_memory(), "cached", None),
+    }
+
+
+def drop_page_cache(wsi_dir: Path) -> None:
+    """Ask the kernel to evict the slides from the page cache (Linux only)."""
+    if not hasattr(os, "posix_fadvise"):
+        return
+    for path in _slide_files(wsi_dir):
+        with open(path, "rb") as f:
+            os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_DONTNEED)
+
+
+def make_config(
+    model: str,
+    batch_size: int,
+    num_workers: int,
+    speedup: bool = False,
+    pin_memory: bool = False,
+    prefetch_factor: int = 2,
+) -> Dict[str, Any]:
+    """Describe one `wsinfer run` configuration."""
+    return {
+        "name": (f"{model}_bs{batch_size}_w{num_workers}_speedup{speedup}"
+                 f"_pin{pin_memory}_pf{prefetch_factor}"),
+        "model": model,
+        "batch_size": batch_size,
+        "num_workers": num_workers,
+        "speedup": speedup,
+        "pin_memory": pin_memory,
+        "prefetch_factor": prefetch_factor,
+    }
+
+
+def _report(result: Dict[str, Any]) -> None:
+    name = result["config"]["name"]
+    if result["success"]:
+        print(f"✅ {name} completed in {result['execution_time_seconds']:.2f} seconds")
+    else:
+        print(f"❌ {name} failed after {result['execution_time_seconds']:.2f} seconds")
+
+
+async def run_config(
+    wsi_dir: Path,
+    results_dir: Path,
+    config: Dict[str, Any],
+    log_dir: Path,
+    *,
+    pool: DevicePool,
+    repeats: int = 1,
+    timeout: Optional[float] = None,
+    monitor_interval: Optional[float] = None,
+    cold_cache: bool = False,
+) -> Dict[str, Any]:
+    """Run one configuration ``repeats`` times, each in a separate process.
+
+    With more than one repeat, an extra warmup run comes first (marked with
+    ``"warmup": True`` and left out of the statistics) so the slides are in the page
+    cache. The result reports the median time, and the median absolute deviation
+    under ``"timing"``. Each run is listed under ``"repetitions"``. With
+    ``cold_cache``, the slides are evicted from the page cache before every run, so
+    there is no warmup run.
+    """
+    warmup = repeats > 1 and not cold_cache
+    total = repeats + 1 if warmup else repeats
+    runs = []
+    for rep in range(total):
+        rep_config = dict(config, name=f"{config['name']}_rep{rep}") if total > 1 else config
+        async with pool.acquire() as env:
+            if cold_cache:
+                drop_page_cache(wsi_dir)
+            run = await run_benchmark(
+                wsi_dir, results_dir, rep_config, log_dir,
+                env=env, timeout=timeout, monitor_interval=monitor_interval,
+            )
+        if total == 1:
+            return run
+        run["warmup"] = warmup and rep == 0
+        runs.append(run)
+        if not run["success"]:
+            # Repeating a failure gives no more information.
+            break
+
+    measured = [r for r in runs if not r["warmup"]] or runs
+    times = [r["execution_time_seconds"] for r in measured]
+    median = statistics.median(times)
+    mad = statistics.median(abs(t - median) for t in times)
+
+    result = dict(runs[-1])
+    del result["warmup"]
+    result.update(
+        config=config,
+        execution_time_seconds=median,
+        success=all(r["success"] for r in runs),
+        timing={"median": median, "mad": mad, "n": len(times)},
+        repetitions=[
+            {k: v for k, v in r.items() if k not in ("config", "stdout", "stderr")}
+            for r in runs
+        ],
+    )
+    for key in ("it_per_s_median", "data_time_median", "gpu_starved_fraction"):
+        values = [r[key] for r in measured if key in r]
+        if values:
+            result[key] = statistics.median(values)
+
+    if median > 0 and mad / median > _NOISY_MAD_FRACTION:
+        print(f"⚠️  {config['name']}: run-to-run deviation is {mad / median:.1%} of the median."
+              " Check for CPU frequency scaling, other load, or cold caches.")
+    return result
+
+
+def _prune_reason(result: Dict[str, Any], best_time: float) -> Optional[str]:
+    """Return why a sweep should stop after this result, or None to keep going."""
+    if _CUDA_ERROR_PATTERN.search(result.get("stderr") or ""):
+        return "cuda_error"
+    if result.get("gpu_starved_fraction", 0.0) > _STARVED_FRACTION:
+        # Larger batches will not help while the model waits on data loading.
+        return "gpu_starved"
+    if result["success"] and result["execution_time_seconds"] > best_time * _REGRESSION_TOLERANCE:
+        return "regression"
+    return None
+
+
+def _workers_idle(result: Dict[str, Any], workers: int) -> bool:
+    """Return True if the run kept far fewer cores busy than it had workers."""
+    effective_cores = result.get("resource_analysis", {}).get("effective_cores")
+    if effective_cores is None or not result["success"]:
+        return False
+    return effective_cores < workers * _MIN_BUSY_WORKER_FRACTION
+
+
+async def dpt_search(
+    model: str,
+    gpu_count: int,
+    *,
+    pool: DevicePool,
+    writer: ResultWriter,
+    wsi_dir: Path,
+    results_dir: Path,
+    log_dir: Path,
+    batch_sizes: List[int],
+    num_workers: Optional[List[int]] = None,
+    speedup: bool = False,
+    pin_memory: bool = False,
+    prefetch_factor: int = 2,
+    repeats: int = 1,
+    timeout: Optional[float] = None,
+    monitor_interval: Optional[float] = None,
+    cold_cache: bool = False,
+) -> List[Dict[str, Any]]:
+    """Search batch sizes and worker counts for one model with early pruning.
+
+    This follows the DPT procedure: the number of workers is stepped upward (outer
+    loop) and, for each, the batch size is stepped upward (inner loop). The
+    inner loop stops as soon as the execution time regresses past the best time seen
+    so far at the same number of workers, the run hits a CUDA error (e.g. out of memory), or the GPU is starved for
+    data, which only more workers can fix. The result that stopped
+    the sweep is kept and marked with ``"pruned": True``. By default the worker
+    counts come from :func:`default_num_workers`.
+
+    When runs are monitored, higher worker counts are skipped once a run keeps far
+    fewer cores busy than it has workers, since more workers would sit idle too.
+
+    Each step depends on the previous one, so a search runs its configurations one
+    after another; independent searches can run concurrently on a shared ``pool``.
+    """
+    if num_workers is None:
+        num_workers = default_num_workers(gpu_count)
+
+    results = []
+    idle_workers = False
+    for workers in sorted(num_workers):
+        if idle_workers:
+            break
+        # Each worker count restarts at the smallest batch size, so compare only
+        # against its own batch steps.
+        best_time = float("inf")
+        for batch_size in sorted(batch_sizes):
+            config = make_config(model, batch_size, workers, speedup, pin_memory, prefetch_factor)
+            result = await run_config(
+                wsi_dir, results_dir, config, log_dir,
+                pool=pool, repeats=repeats, timeout=timeout, monitor_interval=monitor_interval,
+                cold_cache=cold_cache,
+            )
+            results.append(result)
+            _report(result)
+
+            reason = _prune_reason(result, best_time)
+            if reason is not None:
+                result["pruned"] = True
+                result["prune_reason"] = reason
+                print(f"✂️  Pruning larger batch sizes for {workers} workers ({reason})")
+            elif _workers_idle(result, workers):
+                idle_workers = True
+                result["pruned"] = True
+                result["prune_reason"] = "idle_workers"
+                print(f"✂️  Pruning more than {workers} workers (only "
+                      f"{result['resource_analysis']['effective_cores']:.0f} busy cores)")
+            writer.write(result)
+            if result["success"]:
+                best_time = min(best_time, result["execution_time_seconds"])
+            if reason is not None:
+                break
+
+    return results
+
+
+def _seconds_per_batch(result: Dict[str, Any]) -> float:
+    """Cost of a run for tuning: time per batch if known, else wall time."""
+    if result.get("it_per_s_median"):
+        return 1 / result["it_per_s_median"]
+    return result["execution_time_seconds"]
+
+
+async def tuning_search(
+    model: str,
+    *,
+    pool: DevicePool,
+    writer: ResultWriter,
+    wsi_dir: Path,
+    results_dir: Path,
+    log_dir: Path,
+    batch_size: int,
+    num_workers: List[int],
+    prefetch_factors: List[int],
+    speedup: bool = False,
+    repeats: int = 1,
+    timeout: Optional[float] = None,
+    monitor_interval: Optional[float] = None,
+    cold_cache: bool = False,
+) -> List[Dict[str, Any]]:
+    """Tune the data loader for one model at a fixed batch size.
+
+    Memory pinning is on, and only the number of workers and the prefetch factor
+    are searched. For each worker count, starting from the best prefetch factor
+    found so far, the prefetch factor is raised while the time per batch keeps
+    dropping. Worker counts are stepped upward until the best time per batch
+    regresses past the best seen so far. Each axis is walked about once, instead of
+    the full grid.
+    """
+    results = []
+    best_cost = float("inf")
+    start = 0
+    for workers in sorted(n for n in num_workers if n > 0):
+        workers_cost = float("inf")
+        for i in range(start, len(prefetch_factors)):
+            config = make_config(model, batch_size, workers, speedup, True, prefetch_factors[i])
+            result = await run_config(
+                wsi_dir, results_dir, config, log_dir,
+                pool=pool, repeats=repeats, timeout=timeout, monitor_interval=monitor_interval,
+                cold_cache=cold_cache,
+            )
+            results.append(result)
+            _report(result)
+            writer.write(result)
+            if not result["success"] or _seconds_per_batch(result) >= workers_cost:
+                break
+            workers_cost = _seconds_per_batch(result)
+            start = i
+
+        if workers_cost > best_cost * _REGRESSION_TOLERANCE:
+            print(f"✂️  Stopping at {workers} workers for {model} (time per batch regressed)")
+            break
+        best_cost = min(best_cost, workers_cost)
+
+    return results
+
+
+def default_num_workers(gpu_count: int, cpus: Optional[int] = None) -> List[int]:
+    """Derive candidate worker counts from the CPU and GPU count.
+
+    The candidates are 0, 2, 4 per GPU, min(cpus - 2, 8 per GPU) and cpus - gpus,
+    clamped to [0, cpus] and deduplicated. ``cpus`` defaults to the CPU count.
+    """
+    cpus = cpus or os.cpu_count() or 1
+    candidates = {0, 2, 4 * gpu_count, min(cpus - 2, 8 * gpu_count), cpus - gpu_count}
+    return sorted({min(max(n, 0), cpus) for n in candidates})
+
+
+def _force_cpu() -> bool:
+    """Return True if wsinfer is told to ignore GPUs, as in run_inference."""
+    return os.getenv("WSINFER_FORCE_CPU", "0").lower() not in {"0", "f", "false"}
+
+
+async def probe_batch_sizes(
+    model: str,
+    batch_sizes: List[int],
+    *,
+    pool: DevicePool,
+    wsi_dir: Path,
+    results_dir: Path,
+    log_dir: Path,
+    timeout: Optional[float] = None,
+) -> List[int]:
+    """Drop batch sizes that do not fit in GPU memory for ``model``.
+
+    Runs wsinfer on the smallest slide of ``wsi_dir``, starting at the largest batch
+    size and stepping down until a run does not fail with a CUDA error. Sizes above
+    the largest one that fit are dropped.
+    """
+    slide = _pick_probe_slide(wsi_dir)
+    probe_dir = results_dir / "probe_slide"
+    probe_dir.mkdir(exist_ok=True)
+    # MIRAX keeps its data in a directory named after the slide, so link that too.
+    for path in (slide, slide.with_suffix("")):
+        if path.exists() and not (probe_dir / path.name).exists():
+            (probe_dir / path.name).symlink_to(path.resolve())
+
+    sizes = sorted(batch_sizes)
+    for i in range(len(sizes) - 1, 0, -1):
+        config = make_config(model, sizes[i], 0)
+        config["name"] = f"probe_{config['name']}"
+        async with pool.acquire() as env:
+            result = await run_benchmark(probe_dir, results_dir, config, log_dir, env=env, timeout=timeout)
+        if not _CUDA_ERROR_PATTERN.search(result["stderr"]):
+            break
+        print(f"🔎 Batch size {sizes[i]} does not fit in GPU memory for {model}")
+        sizes.pop()
+    return sizes
+
+
+def make_device_pool(system_info: Dict[str, Any], concurrency: Optional[int]) -> DevicePool:
+    """Size the pool of concurrent runs from the available GPUs or CPUs."""
+    gpus = system_info["cuda_device_count"]
+    if concurrency == 1:
+        # A single run at a time sees every GPU, as when running wsinfer by hand.
+        return DevicePool(1)
+    # 0 picks the level from the hardware.
+    if gpus and not _force_cpu():
+        return DevicePool(min(concurrency or gpus, gpus), pin_gpus=True)
+    return DevicePool(concurrency or max((os.cpu_count() or 1) // 2, 1))
+
+
+async def run_all_searches(
+    args: argparse.Namespace,
+    system_info: Dict[str, Any],
+    writer: ResultWriter,
+    results_dir: Path,
+    log_dir: Path,
+) -> List[Dict[str, Any]]:
+    """Run one search per model and loader setting, concurrently where possible.
+
+    This is a DPT search per (model, speedup, pin memory, prefetch factor) or, in
+    tuning mode, a data loader tuning search per (model, speedup).
+    """
+    pool = make_device_pool(system_info, args.concurrency)
+    # Runs pinned to a single GPU see one device, otherwise they see all of them.
+    gpu_count = 1 if pool.pin_gpus else max(system_info["cuda_device_count"], 1)
+    # Concurrent runs share the CPUs, so each one only gets its share of workers.
+    cpus_per_run = max((os.cpu_count() or 1) // pool.slots, 1)
+    num_workers = args.num_workers or default_num_workers(gpu_count, cpus_per_run)
+    if pool.slots > 1 and max(num_workers) > cpus_per_run:
+        print(f"Capping worker counts at {cpus_per_run}, the CPUs per concurrent run")
+        num_workers = sorted({min(n, cpus_per_run) for n in num_workers})
+    print(f"Worker counts: {num_workers}")
+
+    batch_sizes = {model: args.batch_sizes or _DEFAULT_BATCH_SIZES for model in args.models}
+    if args.batch_sizes is None and system_info["cuda_device_count"] and not _force_cpu():
+        probed = await asyncio.gather(*[
+            probe_batch_sizes(
+                model,
+                _DEFAULT_BATCH_SIZES,
+                pool=pool,
+                wsi_dir=args.wsi_dir,
+                results_dir=results_dir,
+                log_dir=log_dir,
+                timeout=args.timeout,
+            )
+            for model in args.models
+        ])
+        batch_sizes = dict(zip(args.models, probed))
+    for model in args.models:
+        print(f"Batch sizes for {model}: {batch_sizes[model]}")
+
+    if args.tuning_mode:
+        searches = [
+            tuning_search(
+                model,
+                pool=pool,
+                writer=writer,
+                wsi_dir=args.wsi_dir,
+                results_dir=results_dir,
+                log_dir=log_dir,
+                batch_size=max(batch_sizes[model]),
+                num_workers=num_workers,
+                prefetch_factors=sorted(args.prefetch_factors or [2, 4, 6]),
+                speedup=speedup,
+                repeats=args.repeats,
+                timeout=args.timeout,
+                monitor_interval=args.monitor_interval,
+                cold_cache=args.cold_cache,
+            )
+            for model in args.models
+            for speedup in [False, True]
+        ]
+    else:
+        searches = [
+            dpt_search(
+                model,
+                gpu_count,
+                pool=pool,
+                writer=writer,
+                wsi_dir=args.wsi_dir,
+                results_dir=results_dir,
+                log_dir=log_dir,
+                batch_sizes=batch_sizes[model],
+                num_workers=num_workers,
+                speedup=speedup,
+                pin_memory=pin_memory,
+                prefetch_factor=prefetch_factor,
+                repeats=args.repeats,
+                timeout=args.timeout,
+                monitor_interval=args.monitor_interval,
+                cold_cache=args.cold_cache,
+            )
+            for model in args.models
+            for speedup in [False, True]
+            for pin_memory in args.pin_memory
+            for prefetch_factor in args.prefetch_factors or [2]
+        ]
+    results = []
+    for search_results in await asyncio.gather(*searches):
+        results.extend(search_results)
+    return results
+
+
+def _parse_bool(value: str) -> bool:
+    if value.lower() in {"1", "true", "yes", "on"}:
+        return True
+    if value.lower() in {"0", "false", "no", "off"}:
+        return False
+    raise argparse.ArgumentTypeError(f"expected true or false, got {value!r}")
 
 
 def main():
@@ -91,73 +906,118 @@ def main():
     parser.add_argument("--output", type=Path, default="benchmark_results.json", help="Output JSON file")
     parser.add_argument("--models", nargs="+", default=["breast-tumor-resnet34.tcga-brca"], 
                        help="Models to benchmark")
-    parser.add_argument("--batch-sizes", nargs="+", type=int, default=[16, 32, 64], 
-                       help="Batch sizes to test")
-    parser.add_argument("--num-workers", nargs="+", type=int, default=[0, 2, 4], 
-                       help="Number of workers to test")
+    parser.add_argument("--batch-sizes", nargs="+", type=int, default=None,
+                       help="Batch sizes to test (default: 8 16 32 64 128; with CUDA, sizes"
+                            " that run out of GPU memory are dropped first by running full"
+                            " inference on the smallest slide, once per size from the top)")
+    parser.add_argument("--num-workers", nargs="+", type=int, default=None,
+                       help="Number of workers to test (default: 0, 2, 4 per GPU,"
+                            " min(CPUs - 2, 8 per GPU) and CPUs - GPUs, clamped to the CPU"
+                            " count)")
+    parser.add_argument("--pin-memory", nargs="+", type=_parse_bool, default=[False],
+                       help="Memory pinning settings to test, e.g. 'false true'")
+    parser.add_argument("--prefetch-factors", nargs="+", type=int, default=None,
+                       help="Data loader prefetch factors to test (default: 2, or 2 4 6 with"
+                            " --tuning-mode)")
+    parser.add_argument("--tuning-mode", action="store_true",
+                       help="Pin memory, use the largest batch size, and search only worker"
+                            " counts and prefetch factors, walking each axis once")
+    parser.add_argument("--cold-cache", action="store_true",
+                       help="Evict the slides from the page cache before every run to measure"
+                            " cold starts (Linux only)")
+    parser.add_argument("--concurrency", type=int, default=1,
+                       help="Maximum number of runs at once (default: 1, so timings are"
+                            " comparable). 0 runs one per GPU, or half the CPU count without"
+                            " GPUs; worker counts are then capped at each run's share of CPUs.")
+    parser.add_argument("--repeats", type=int, default=1,
+                       help="Run each configuration this many times, each in a new process,"
+                            " and report the median (with an extra warmup run when > 1,"
+                            " unless --cold-cache)")
+    parser.add_argument("--timeout", type=float, default=None,
+                       help="Kill a run after this many seconds")
+    parser.add_argument("--monitor-interval", type=float, default=None,
+                       help="Sample CPU/GPU usage every this many seconds during each run"
+                            " and stop adding workers that leave cores idle (default: off)."
+                            " Keep --concurrency at 1 with it, since usage is system-wide.")
     args = parser.parse_args()
     
     if not args.wsi_dir.exists():
         print(f"Error: WSI directory {args.wsi_dir} does not exist")
         sys.exit(1)
+    if not _wsinfer_slides(args.wsi_dir):
+        print(f"Error: WSI directory {args.wsi_dir} has no slides (wsinfer reads only files"
+              " at its top level)")
+        sys.exit(1)
     
     # Create temporary results directory
     results_base_dir = Path("benchmark_temp_results")
     results_base_dir.mkdir(exist_ok=True)
     
-    # Generate benchmark configurations
-    configs = []
-    for model in args.models:
-        for batch_size in args.batch_sizes:
-            for num_workers in args.num_workers:
-                for speedup in [False, True]:
-                    config_name = f"{model}_bs{batch_size}_w{num_workers}_speedup{speedup}"
-                    configs.append({
-                        "name": config_name,
-                        "model": model,
-                        "batch_size": batch_size,
-                        "num_workers": num_workers,
-                        "speedup": speedup,
-                    })
-    
-    print(f"Running {len(configs)} benchmark configurations...")
-    
-    benchmark_results = {
-        "system_info": get_system_info(),
+    # Full stdout/stderr of each run is kept next to the output file.
+    log_dir = args.output.with_name(f"{args.output.stem}_logs")
+    log_dir.mkdir(exist_ok=True)
+
+    if args.concurrency != 1:
+        print("Warning: concurrent runs compete for CPUs, memory bandwidth and disk, so their"
+              " timings are not directly comparable; use --concurrency 1 for final numbers")
+    if args.monitor_interval and args.concurrency != 1:
+        print("Warning: resource usage is system-wide, so concurrent runs skew --monitor-interval"
+              " results; consider --concurrency 1")
+
+    if args.cold_cache and args.concurrency != 1:
+        print("Warning: --cold-cache evicts slides that concurrent runs may be reading;"
+              " consider --concurrency 1")
+
+    system_info = get_system_info()
+    # Read the slides once up front, so the first configurations are not slowed by
+    # disk reads that later ones skip.
+    page_cache = None
+    if not args.cold_cache:
+        page_cache = warm_page_cache(args.wsi_dir)
+        message = f"🔥 Read {page_cache['bytes_read'] / 1024**3:.2f} GB of slides"
+        if page_cache["cached_before"] is not None:
+            message += (f"; page cache {page_cache['cached_before'] / 1024**3:.2f} ->"
+                        f" {page_cache['cached_after'] / 1024**3:.2f} GB")
+        print(message)
+    header = {
+        "system_info": system_info,
         "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
         "wsi_directory": str(args.wsi_dir),
-        "results": []
+        "page_cache": page_cache,
+        "cold_cache": args.cold_cache,
     }
-    
-    for i, config in enumerate(configs, 1):
-        print(f"\n--- Benchmark {i}/{len(configs)} ---")
-        result = run_benchmark(args.wsi_dir, results_base_dir, config)
-        benchmark_results["results"].append(result)
-        
-        if result["success"]:
-            print(f"✅ Completed in {result['execution_time_seconds']:.2f} seconds")
-        else:
-            print(f"❌ Failed after {result['execution_time_seconds']:.2f} seconds")
-    
-    # Save results
-    with open(args.output, 'w') as f:
-        json.dump(benchmark_results, f, indent=2)
-    
-    print(f"\n📊 Benchmark results saved to {args.output}")
-    
+    with ResultWriter(args.output, header) as writer:
+        asyncio.run(run_all_searches(args, system_info, writer, results_base_dir, log_dir))
+
+    print(f"\n📊 Benchmark results saved to {args.output} (logs in {log_dir})")
+    columns = writer.arrays()
+    parquet_path = args.output.with_suffix(".parquet")
+    if write_parquet(columns, parquet_path):
+        print(f"📦 Result columns saved to {parquet_path}")
+
     # Print summary
-    successful_runs = [r for r in benchmark_results["results"] if r["success"]]
-    if successful_runs:
-        fastest = min(successful_runs, key=lambda x: x["execution_time_seconds"])
-        slowest = max(successful_runs, key=lambda x: x["execution_time_seconds"])
-        
+    successful = np.flatnonzero(columns["success"])
+    if successful.size:
+        # Rank by inference throughput in patches per second, which excludes model
+        # loading and patching. Fall back to wall time when no progress output was
+        # parsed.
+        throughput = columns["patches_per_s"][successful]
+        if not np.isnan(throughput).any():
+            fastest = successful[throughput.argmax()]
+            slowest = successful[throughput.argmin()]
+        else:
+            execution_time = columns["execution_time"][successful]
+            fastest = successful[execution_time.argmin()]
+            slowest = successful[execution_time.argmax()]
+
         print(f"\n📈 Performance Summary:")
-        print(f"Successful runs: {len(successful_runs)}/{len(configs)}")
-        print(f"Fastest: {fastest['config']['name']} ({fastest['execution_time_seconds']:.2f}s)")
-        print(f"Slowest: {slowest['config']['name']} ({slowest['execution_time_seconds']:.2f}s)")
-    
+        print(f"Successful runs: {successful.size}/{len(columns['success'])}")
+        for label, i in (("Fastest", fastest), ("Slowest", slowest)):
+            rate = columns["patches_per_s"][i]
+            rate = "" if np.isnan(rate) else f", {rate:.1f} patches/s"
+            print(f"{label}: {columns['name'][i]} ({columns['execution_time'][i]:.2f}s{rate})")
+
     # Cleanup
-    import shutil
     shutil.rmtree(results_base_dir)
 
 
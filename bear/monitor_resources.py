@@ -3,100 +3,429 @@
 Monitor system resources during WSInfer execution.
 
 Usage:
-    python monitor_resources.py --command "wsinfer run --wsi-dir slides/ --results-dir results/ --model breast-tumor-resnet34.tcga-brca"
+    python monitor_resources.py -- wsinfer run --wsi-dir slides/ --results-dir results/ --model breast-tumor-resnet34.tcga-brca
+
+Everything after the options is the command to run, exactly as the shell split it.
+The older ``--command "..."`` form is still accepted and split with shell rules.
 """
 
 import argparse
+import functools
+import importlib.util
+import multiprocessing
+import os
+import shlex
 import subprocess
-import threading
 import time
 import json
+import numpy as np
 import psutil
-import sys
-from pathlib import Path
-from typing import Dict, List, Any
+from multiprocessing import shared_memory
+from numpy.lib import recfunctions
+from typing import Dict, List, Any, Optional
+
+# Prefer NVML, which queries the driver in-process. GPUtil shells out to nvidia-smi
+# on every call and is only used as a fallback.
+try:
+    import pynvml
+    pynvml.nvmlInit()
+    NVML_HANDLES = [pynvml.nvmlDeviceGetHandleByIndex(i) for i in range(pynvml.nvmlDeviceGetCount())]
+except Exception:
+    pynvml = None
+    NVML_HANDLES = []
 
 try:
-    import GPUtil
-    GPU_AVAILABLE = True
+    import orjson
 except ImportError:
-    GPU_AVAILABLE = False
+    orjson = None
+
+
+@functools.lru_cache(maxsize=None)
+def _gputil():
+    """Import GPUtil on first use, or return None if it is not installed."""
+    try:
+        import GPUtil
+    except ImportError:
+        return None
+    return GPUtil
+
+
+GPU_AVAILABLE = pynvml is not None or importlib.util.find_spec("GPUtil") is not None
+
+
+def _to_list(obj: Any) -> Any:
+    if isinstance(obj, (np.ndarray, np.generic)):
+        if np.issubdtype(obj.dtype, np.floating):
+            # NaN and inf are not valid JSON; orjson writes them as null too.
+            return np.where(np.isfinite(obj), obj, None).tolist()
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def json_dumps(obj: Any, indent: bool = False) -> bytes:
+    """Serialize to JSON bytes with orjson if installed, else the standard library.
+
+    NumPy arrays and scalars are accepted either way; orjson encodes them directly.
+    """
+    if orjson is not None:
+        option = orjson.OPT_SERIALIZE_NUMPY | (orjson.OPT_INDENT_2 if indent else 0)
+        return orjson.dumps(obj, option=option)
+    return json.dumps(obj, indent=2 if indent else None, default=_to_list).encode()
+
+
+json_loads = orjson.loads if orjson is not None else json.loads
+
+
+_GB = 1 / 1024**3
+_MB = 1 / 1024**2
+
+# Adaptive sampling: smoothing factor of the utilization moving averages, and the
+# deviation from them (in percentage points) that counts as a change.
+_EMA_ALPHA = 0.2
+_CHANGE_PERCENT = 10
+# Upper bound on the shared sample buffer, which lives in /dev/shm (64 MB by default
+# in Docker) and is allocated once per monitored run.
+_MAX_BUFFER_BYTES = 16 * 1024**2
+# Seconds to wait for the sampler process to import its modules and take a sample.
+_SAMPLER_START_TIMEOUT_S = 60
+
+
+# Columns of the sample buffer: system fields, then fields of the tracked process
+# (NaN when none is tracked), then GPU fields with one column per GPU, followed by one
+# column per CPU core. The timestamp is in seconds on the monotonic clock, which NTP
+# adjustments do not step.
+SYSTEM_FIELDS = ("timestamp", "cpu_percent", "memory_percent", "memory_used_gb", "memory_available_gb")
+PROCESS_FIELDS = ("process_cpu_user_s", "process_cpu_system_s", "process_rss_gb", "process_num_threads")
+GPU_FIELDS = ("gpu_memory_used_mb", "gpu_memory_total_mb", "gpu_memory_percent", "gpu_percent", "gpu_temperature")
+
+
+def _detect_gpus() -> List[str]:
+    if pynvml is not None:
+        names = [pynvml.nvmlDeviceGetName(handle) for handle in NVML_HANDLES]
+        # Older NVML bindings return bytes.
+        return [name.decode() if isinstance(name, bytes) else name for name in names]
+    gputil = _gputil()
+    if gputil is None:
+        return []
+    try:
+        return [gpu.name for gpu in gputil.getGPUs()]
+    except Exception:
+        return []
+
+
+def _sampler(shm_name, shape, n_gpus, interval, min_interval, max_interval,
+             ready, stop, count, skipped, pid, gpu_error):
+    """Sampling loop run in the monitor process.
+
+    Rows are written into the shared ring buffer ``shm_name`` and ``count`` holds
+    the number of rows written so far. Once ``pid`` is set, that process is sampled
+    too. Samples are taken on a fixed schedule of monotonic deadlines, so the time
+    spent sampling does not stretch the period; ``skipped`` counts the samples that
+    overran their deadline.
+
+    If ``min_interval < max_interval`` the interval adapts: it halves (down to
+    ``min_interval``) when CPU or GPU utilization moves away from its moving average,
+    and grows by 10% (up to ``max_interval``) while they are steady.
+    """
+    if hasattr(os, "sched_setaffinity"):
+        # Keep the sampler on one core, away from where the workload usually starts.
+        os.sched_setaffinity(0, {max(os.sched_getaffinity(0))})
+    shm = shared_memory.SharedMemory(name=shm_name)
+    buf = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+    rows = shape[0]
+    n_system = len(SYSTEM_FIELDS)
+    gpu_start = n_system + len(PROCESS_FIELDS)
+    cores_start = gpu_start + len(GPU_FIELDS) * n_gpus
+    gpu_util_start = gpu_start + GPU_FIELDS.index("gpu_percent") * n_gpus
+    adaptive = min_interval < max_interval
+    ema_cpu = ema_gpu = None
+    gputil = _gputil() if n_gpus and pynvml is None else None
+    # Bind the per-tick calls once; the loop body then does no module lookups.
+    clock_ns = time.monotonic_ns
+    monotonic = time.monotonic
+    cpu_percent = psutil.cpu_percent
+    virtual_memory = psutil.virtual_memory
+    process = None
+
+    # The first call only sets the reference point for the next one.
+    cpu_percent(interval=None, percpu=True)
+    ready.set()
+    deadline = monotonic()
+    while not stop.is_set():
+        row = buf[count.value % rows]
+        timestamp = clock_ns() * 1e-9
+        # The overall CPU percent is the mean over cores, so one call gives both.
+        cores = row[cores_start:]
+        cores[:] = cpu_percent(interval=None, percpu=True)
+        vm = virtual_memory()
+        row[:n_system] = (timestamp, cores.mean(), vm.percent, vm.used * _GB, vm.available * _GB)
+
+        if process is None and pid.value:
+            try:
+                process = psutil.Process(pid.value)
+            except psutil.Error:
+                pid.value = 0
+        if process is None:
+            row[n_system:gpu_start] = np.nan
+        else:
+            try:
+                # oneshot() reads the process stats once for all three calls.
+                with process.oneshot():
+                    cpu_times = process.cpu_times()
+                    mem_info = process.memory_info()
+                    num_threads = process.num_threads()
+                row[n_system:gpu_start] = (cpu_times.user, cpu_times.system, mem_info.rss * _GB, num_threads)
+            except psutil.Error:
+                # The process exited.
+                row[n_system:gpu_start] = np.nan
+                process = None
+                pid.value = 0
+
+        # GPU monitoring if available. Column gpu_start + k * n_gpus + j holds
+        # field k of GPU j, so each GPU fills a strided slice of the row.
+        if n_gpus:
+            try:
+                if pynvml is not None:
+                    for j, handle in enumerate(NVML_HANDLES):
+                        mem = pynvml.nvmlDeviceGetMemoryInfo(handle)
+                        util = pynvml.nvmlDeviceGetUtilizationRates(handle)
+                        row[gpu_start + j:cores_start:n_gpus] = (
+                            mem.used * _MB,
+                            mem.total * _MB,
+                            mem.used / mem.total * 100,
+                            util.gpu,
+                            pynvml.nvmlDeviceGetTemperature(handle, pynvml.NVML_TEMPERATURE_GPU),
+                        )
+                else:
+                    row[gpu_start:cores_start] = np.nan
+                    for j, gpu in enumerate(gputil.getGPUs()[:n_gpus]):
+                        row[gpu_start + j:cores_start:n_gpus] = (
+                            gpu.memoryUsed,
+                            gpu.memoryTotal,
+                            gpu.memoryUtil * 100,
+                            gpu.load * 100,
+                            gpu.temperature,
+                        )
+            except Exception as e:
+                row[gpu_start:cores_start] = np.nan
+                gpu_error.value = str(e).encode()[:len(gpu_error) - 1]
+
+        count.value += 1
+        if adaptive:
+            cpu = row[1]
+            # GPUs that could not be read are NaN; leave them out rather than letting
+            # one failed read poison the moving average for the rest of the run.
+            gpus = row[gpu_util_start:gpu_util_start + n_gpus]
+            gpus = gpus[np.isfinite(gpus)]
+            gpu = gpus.max() if gpus.size else None
+            if ema_cpu is None:
+                ema_cpu = cpu
+            if ema_gpu is None:
+                ema_gpu = gpu
+            changed = abs(cpu - ema_cpu) > _CHANGE_PERCENT
+            if gpu is not None:
+                changed = changed or abs(gpu - ema_gpu) > _CHANGE_PERCENT
+                ema_gpu += _EMA_ALPHA * (gpu - ema_gpu)
+            if changed:
+                interval = max(min_interval, interval * 0.5)
+            else:
+                interval = min(max_interval, interval * 1.1)
+            ema_cpu += _EMA_ALPHA * (cpu - ema_cpu)
+
+        deadline += interval
+        delay = deadline - monotonic()
+        if delay > 0:
+            stop.wait(delay)
+        else:
+            # Sampling took longer than the interval; restart the schedule from now.
+            skipped.value += 1
+            deadline = monotonic()
+
+    del buf, row, cores
+    shm.close()
 
 
 class ResourceMonitor:
-    def __init__(self, interval: float = 1.0):
+    """Sample system (and GPU) usage in a separate process.
+
+    Sampling runs in its own process, pinned to one core, so it does not compete for
+    the GIL with the caller. Samples are written into a ring buffer in shared memory
+    sized for ``max_duration_s`` of monitoring, but no more than 16 MiB; past that,
+    the oldest samples are overwritten.
+
+    With ``min_interval`` and ``max_interval``, sampling starts at ``interval`` and
+    speeds up while usage changes and slows down while it is steady (see
+    :func:`_sampler`). The buffer is then sized for ``min_interval``. Averages in
+    :func:`analyze_timeline` are per sample, so they lean toward the busy phases.
+    """
+
+    def __init__(
+        self,
+        interval: float = 1.0,
+        max_duration_s: float = 24 * 3600,
+        min_interval: Optional[float] = None,
+        max_interval: Optional[float] = None,
+    ):
         self.interval = interval
-        self.monitoring = False
-        self.data = []
+        self.min_interval = min(min_interval or interval, interval)
+        self.max_interval = max(max_interval or interval, interval)
+        self.gpu_names = _detect_gpus()
+        self.gpu_error = None
+        self.skipped_deadlines = 0
+        self.n_cores = psutil.cpu_count() or 1
+
+        n_gpus = len(self.gpu_names)
+        fields = [(name, np.float64) for name in SYSTEM_FIELDS + PROCESS_FIELDS]
+        if n_gpus:
+            fields += [(name, np.float64, (n_gpus,)) for name in GPU_FIELDS]
+        fields.append(("cpu_percent_per_core", np.float64, (self.n_cores,)))
+        self.dtype = np.dtype(fields)
+        cols = len(SYSTEM_FIELDS) + len(PROCESS_FIELDS) + len(GPU_FIELDS) * n_gpus + self.n_cores
+        rows = max(min(int(max_duration_s / self.min_interval), _MAX_BUFFER_BYTES // (cols * 8)), 1)
+        self._shape = (rows, cols)
         
     def start_monitoring(self):
-        """Start monitoring system resources."""
-        self.monitoring = True
-        self.monitor_thread = threading.Thread(target=self._monitor_loop)
-        self.monitor_thread.start()
+        """Start the sampler process and wait until it takes its first sample.
+
+        Raises ``RuntimeError`` if the sampler exits or does not get ready in time.
+        """
+        # Spawn rather than fork so the sampler does not inherit the caller's heap
+        # or its CUDA/NVML state.
+        ctx = multiprocessing.get_context("spawn")
+        # Pages are only committed as the sampler fills rows, and only rows that were
+        # written are read back, so the buffer is not initialized here.
+        self._shm = shared_memory.SharedMemory(create=True, size=self._shape[0] * self._shape[1] * 8)
+        self._count = ctx.Value("Q", 0)
+        self._skipped = ctx.Value("Q", 0)
+        self._pid = ctx.Value("q", 0)
+        self._gpu_error = ctx.Array("c", 256)
+        self._stop = ctx.Event()
+        ready = ctx.Event()
+        self._process = ctx.Process(
+            target=_sampler,
+            args=(self._shm.name, self._shape, len(self.gpu_names), self.interval,
+                  self.min_interval, self.max_interval, ready, self._stop, self._count, self._skipped, self._pid, self._gpu_error),
+            daemon=True,
+        )
+        self._process.start()
+        deadline = time.monotonic() + _SAMPLER_START_TIMEOUT_S
+        while not ready.wait(0.1):
+            if self._process.is_alive() and time.monotonic() < deadline:
+                continue
+            self._process.kill()
+            self._process.join()
+            exitcode = self._process.exitcode
+            del self._process
+            self._shm.close()
+            self._shm.unlink()
+            raise RuntimeError(f"Resource sampler failed to start (exit code {exitcode})")
         
-    def stop_monitoring(self):
-        """Stop monitoring and return collected data."""
-        self.monitoring = False
-        if hasattr(self, 'monitor_thread'):
-            self.monitor_thread.join()
-        return self.data
+    def track_process(self, pid: int):
+        """Also sample CPU time, memory and threads of process ``pid``."""
+        self._pid.value = pid
         
-    def _monitor_loop(self):
-        """Main monitoring loop."""
-        while self.monitoring:
-            timestamp = time.time()
-            
-            # CPU and Memory
-            cpu_percent = psutil.cpu_percent(interval=None)
-            memory = psutil.virtual_memory()
-            
-            data_point = {
-                "timestamp": timestamp,
-                "cpu_percent": cpu_percent,
-                "memory_percent": memory.percent,
-                "memory_used_gb": memory.used / (1024**3),
-                "memory_available_gb": memory.available / (1024**3),
-            }
-            
-            # GPU monitoring if available
-            if GPU_AVAILABLE:
-                try:
-                    gpus = GPUtil.getGPUs()
-                    gpu_data = []
-                    for gpu in gpus:
-                        gpu_data.append({
-                            "id": gpu.id,
-                            "name": gpu.name,
-                            "memory_used_mb": gpu.memoryUsed,
-                            "memory_total_mb": gpu.memoryTotal,
-                            "memory_percent": gpu.memoryUtil * 100,
-                            "gpu_percent": gpu.load * 100,
-                            "temperature": gpu.temperature,
-                        })
-                    data_point["gpus"] = gpu_data
-                except Exception as e:
-                    data_point["gpu_error"] = str(e)
-            
-            self.data.append(data_point)
-            time.sleep(self.interval)
-
-
-def run_with_monitoring(command: List[str], monitor_interval: float = 1.0) -> Dict[str, Any]:
+    def stop_monitoring(self) -> np.ndarray:
+        """Stop monitoring and return collected samples as a structured array."""
+        if not hasattr(self, '_process'):
+            return np.empty(0, dtype=self.dtype)
+        self._stop.set()
+        self._process.join()
+        if self._gpu_error.value:
+            self.gpu_error = self._gpu_error.value.decode()
+        self.skipped_deadlines = self._skipped.value
+
+        buf = np.ndarray(self._shape, dtype=np.float64, buffer=self._shm.buf)
+        written = self._count.value
+        rows = self._shape[0]
+        if written <= rows:
+            samples = buf[:written].copy()
+        else:
+            # The ring wrapped; the oldest sample is at the write position.
+            samples = np.roll(buf, -(written % rows), axis=0)
+        del buf
+        self._shm.close()
+        self._shm.unlink()
+        return recfunctions.unstructured_to_structured(samples, dtype=self.dtype)
+
+
+def timeline_to_columns(timeline: np.ndarray) -> Dict[str, np.ndarray]:
+    """Split a structured sample array into contiguous columns for :func:`json_dumps`."""
+    return {name: np.ascontiguousarray(timeline[name]) for name in timeline.dtype.names}
+
+
+def analyze_timeline(timeline: np.ndarray) -> Dict[str, Any]:
+    """Summarize a structured sample array from :class:`ResourceMonitor`.
+
+    ``effective_cores`` counts the cores that were busy more than half of the time,
+    and ``cpu_imbalance`` is the coefficient of variation of per-core utilization. A
+    few busy cores and a high imbalance usually mean the data loader is starved.
+    """
+    if not len(timeline):
+        return {}
+
+    per_core_mean = timeline["cpu_percent_per_core"].mean(axis=0)
+    mean_core = per_core_mean.mean()
+    analysis = {
+        "max_cpu_percent": float(timeline["cpu_percent"].max()),
+        "avg_cpu_percent": float(timeline["cpu_percent"].mean()),
+        "max_memory_gb": float(timeline["memory_used_gb"].max()),
+        "avg_memory_gb": float(timeline["memory_used_gb"].mean()),
+        "effective_cores": float((per_core_mean > 50).sum()),
+        "cpu_imbalance": float(per_core_mean.std() / mean_core) if mean_core > 0 else 0.0,
+    }
+
+    rss = timeline["process_rss_gb"]
+    if np.isfinite(rss).any():
+        cpu_seconds = timeline["process_cpu_user_s"] + timeline["process_cpu_system_s"]
+        cpu_seconds = cpu_seconds[np.isfinite(cpu_seconds)]
+        analysis.update({
+            "max_process_rss_gb": float(np.nanmax(rss)),
+            "process_cpu_seconds": float(cpu_seconds[-1] - cpu_seconds[0]),
+            "max_process_threads": float(np.nanmax(timeline["process_num_threads"])),
+        })
+
+    names = timeline.dtype.names
+    if "gpu_memory_used_mb" in names and np.isfinite(timeline["gpu_memory_used_mb"]).any():
+        gpu_memory_usage = timeline["gpu_memory_used_mb"]
+        gpu_utilization = timeline["gpu_percent"]
+        analysis.update({
+            "max_gpu_memory_mb": float(np.nanmax(gpu_memory_usage)),
+            "avg_gpu_memory_mb": float(np.nanmean(gpu_memory_usage)),
+            "max_gpu_utilization": float(np.nanmax(gpu_utilization)),
+            "avg_gpu_utilization": float(np.nanmean(gpu_utilization)),
+        })
+    return analysis
+
+
+def run_with_monitoring(
+    command: List[str],
+    monitor_interval: float = 1.0,
+    max_duration_s: float = 24 * 3600,
+    min_interval: Optional[float] = None,
+    max_interval: Optional[float] = None,
+) -> Dict[str, Any]:
     """Run a command while monitoring system resources."""
     
-    print(f"Starting monitoring for command: {' '.join(command)}")
+    print(f"Starting monitoring for command: {shlex.join(command)}")
     
     # Start resource monitoring
-    monitor = ResourceMonitor(interval=monitor_interval)
+    monitor = ResourceMonitor(
+        interval=monitor_interval,
+        max_duration_s=max_duration_s,
+        min_interval=min_interval,
+        max_interval=max_interval,
+    )
     monitor.start_monitoring()
     
     start_time = time.time()
     
     try:
         # Run the command
-        result = subprocess.run(command, capture_output=True, text=True)
+        proc = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        monitor.track_process(proc.pid)
+        stdout, stderr = proc.communicate()
         end_time = time.time()
+        result = subprocess.CompletedProcess(command, proc.returncode, stdout, stderr)
         
         success = result.returncode == 0
         
@@ -115,36 +444,10 @@ def run_with_monitoring(command: List[str], monitor_interval: float = 1.0) -> Di
     execution_time = end_time - start_time
     
     # Analyze resource usage
-    if resource_data:
-        cpu_usage = [d["cpu_percent"] for d in resource_data]
-        memory_usage = [d["memory_used_gb"] for d in resource_data]
-        
-        analysis = {
-            "max_cpu_percent": max(cpu_usage),
-            "avg_cpu_percent": sum(cpu_usage) / len(cpu_usage),
-            "max_memory_gb": max(memory_usage),
-            "avg_memory_gb": sum(memory_usage) / len(memory_usage),
-        }
-        
-        if GPU_AVAILABLE and any("gpus" in d for d in resource_data):
-            gpu_memory_usage = []
-            gpu_utilization = []
-            
-            for data_point in resource_data:
-                if "gpus" in data_point:
-                    for gpu in data_point["gpus"]:
-                        gpu_memory_usage.append(gpu["memory_used_mb"])
-                        gpu_utilization.append(gpu["gpu_percent"])
-            
-            if gpu_memory_usage:
-                analysis.update({
-                    "max_gpu_memory_mb": max(gpu_memory_usage),
-                    "avg_gpu_memory_mb": sum(gpu_memory_usage) / len(gpu_memory_usage),
-                    "max_gpu_utilization": max(gpu_utilization),
-                    "avg_gpu_utilization": sum(gpu_utilization) / len(gpu_utilization),
-                })
-    else:
-        analysis = {}
+    analysis = analyze_timeline(resource_data)
+    analysis["skipped_deadlines"] = monitor.skipped_deadlines
+    if monitor.gpu_error is not None:
+        analysis["gpu_error"] = monitor.gpu_error
     
     return {
         "success": success,
@@ -153,47 +456,75 @@ def run_with_monitoring(command: List[str], monitor_interval: float = 1.0) -> Di
         "stdout": result.stdout,
         "stderr": result.stderr,
         "resource_analysis": analysis,
-        "resource_timeline": resource_data,
+        "gpu_names": monitor.gpu_names,
+        "resource_timeline": timeline_to_columns(resource_data),
     }
 
 
 def main():
     parser = argparse.ArgumentParser(description="Monitor resources during WSInfer execution")
-    parser.add_argument("--command", required=True, help="Command to run and monitor")
+    parser.add_argument("command", nargs=argparse.REMAINDER,
+                        help="Command to run and monitor, after the options (use -- to separate)")
+    parser.add_argument("--command", dest="command_string", default=None,
+                        help="Command to run and monitor, as a single string (deprecated)")
     parser.add_argument("--output", default="resource_monitor.json", help="Output file")
     parser.add_argument("--interval", type=float, default=1.0, help="Monitoring interval in seconds")
+    parser.add_argument("--min-interval", type=float, default=None,
+                        help="Shortest interval when adapting to changing usage, e.g. 0.05"
+                             " (default: --interval, i.e. fixed)")
+    parser.add_argument("--max-interval", type=float, default=None,
+                        help="Longest interval when usage is steady, e.g. 5.0"
+                             " (default: --interval, i.e. fixed)")
+    parser.add_argument("--max-duration", type=float, default=24 * 3600,
+                        help="Seconds of samples to keep (at most 16 MiB of them); older samples"
+                             " are overwritten")
     
     args = parser.parse_args()
     
-    # Parse command
-    command = args.command.split()
+    command = args.command
+    if command[:1] == ["--"]:
+        command = command[1:]
+    if args.command_string is not None:
+        if command:
+            parser.error("give the command either after the options or with --command, not both")
+        command = shlex.split(args.command_string)
+    if not command:
+        parser.error("no command given")
     
-    print(f"Monitoring command: {args.command}")
+    print(f"Monitoring command: {shlex.join(command)}")
     if GPU_AVAILABLE:
         print("GPU monitoring enabled")
     else:
-        print("GPU monitoring not available (install GPUtil for GPU monitoring)")
+        print("GPU monitoring not available (install nvidia-ml-py or GPUtil for GPU monitoring)")
     
     # Run with monitoring
-    results = run_with_monitoring(command, args.interval)
+    results = run_with_monitoring(
+        command, args.interval, args.max_duration, args.min_interval, args.max_interval
+    )
     
     # Save results
-    with open(args.output, 'w') as f:
-        json.dump(results, f, indent=2)
+    with open(args.output, 'wb') as f:
+        f.write(json_dumps(results, indent=True))
     
     # Print summary
     print(f"\n📊 Monitoring Results:")
     print(f"Success: {results['success']}")
     print(f"Execution time: {results['execution_time']:.2f} seconds")
     
-    if results['resource_analysis']:
-        analysis = results['resource_analysis']
-        print(f"Max CPU: {analysis.get('max_cpu_percent', 'N/A'):.1f}%")
-        print(f"Max Memory: {analysis.get('max_memory_gb', 'N/A'):.2f} GB")
+    analysis = results['resource_analysis']
+    if 'max_cpu_percent' in analysis:
+        print(f"Max CPU: {analysis['max_cpu_percent']:.1f}%")
+        print(f"Max Memory: {analysis['max_memory_gb']:.2f} GB")
+        print(f"Effective cores: {analysis['effective_cores']:.0f} (imbalance {analysis['cpu_imbalance']:.2f})")
+        if 'max_process_rss_gb' in analysis:
+            print(f"Max process RSS: {analysis['max_process_rss_gb']:.2f} GB")
         
         if 'max_gpu_memory_mb' in analysis:
             print(f"Max GPU Memory: {analysis['max_gpu_memory_mb']:.0f} MB")
             print(f"Max GPU Utilization: {analysis['max_gpu_utilization']:.1f}%")
+        if analysis["skipped_deadlines"]:
+            print(f"⚠️  {analysis['skipped_deadlines']} samples overran the interval;"
+                  " consider a larger --interval")
     
     print(f"Full results saved to: {args.output}")
 
@@ -3,9 +3,12 @@ from __future__ import annotations
 import json
 import os
 import platform
+import re
+import subprocess
 import sys
 import time
 from pathlib import Path
+from typing import Any
 
 import geojson as geojsonlib
 import h5py
@@ -247,6 +250,104 @@ def test_cli_run_with_local_model(tmp_path: Path, tiff_image: Path) -> None:
         ), f"Column {prob_col} not allclose at atol=1e-07"
 
 
+@pytest.mark.parametrize("num_workers", [0, 2])
+@pytest.mark.parametrize("pin_memory", [False, True])
+def test_cli_run_dataloader_options(
+    pin_memory: bool,
+    num_workers: int,
+    tmp_path: Path,
+    tiff_image: Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Data loading options should reach the DataLoader and not change the outputs."""
+    model = "breast-tumor-resnet34.tcga-brca"
+    reference_csv = Path(__file__).parent / "reference" / model / "purple.csv"
+    if not reference_csv.exists():
+        raise FileNotFoundError(f"reference CSV not found: {reference_csv}")
+
+    loader_kwargs: list[dict[str, Any]] = []
+    data_loader = torch.utils.data.DataLoader
+
+    def recording_data_loader(
+        *args: Any, **kwargs: Any
+    ) -> torch.utils.data.DataLoader:
+        loader_kwargs.append(kwargs)
+        return data_loader(*args, **kwargs)
+
+    monkeypatch.setattr(torch.utils.data, "DataLoader", recording_data_loader)
+
+    runner = CliRunner()
+    results_dir = tmp_path / "inference"
+    result = runner.invoke(
+        cli,
+        [
+            "--backend",
+            "tiffslide",
+            "run",
+            "--wsi-dir",
+            str(tiff_image.parent),
+            "--results-dir",
+            str(results_dir),
+            "--model",
+            model,
+            "--num-workers",
+            str(num_workers),
+            "--prefetch-factor",
+            "4",
+            "--pin-memory" if pin_memory else "--no-pin-memory",
+        ],
+    )
+    assert result.exit_code == 0
+
+    # Memory is only pinned for CUDA, and prefetching needs worker processes.
+    expected_pin_memory = pin_memory and 'Using device "cuda"' in result.output
+    assert loader_kwargs
+    for kwargs in loader_kwargs:
+        assert kwargs["num_workers"] == num_workers
+        assert kwargs["pin_memory"] == expected_pin_memory
+        if num_workers > 0:
+            assert kwargs["prefetch_factor"] == 4
+        else:
+            assert "prefetch_factor" not in kwargs
+
+    df = pd.read_csv(results_dir / "model-outputs-csv" / "purple.csv")
+    df_ref = pd.read_csv(reference_csv)
+    assert df.shape == df_ref.shape
+    prob_cols = df_ref.filter(like="prob_").columns.tolist()
+    for prob_col in prob_cols:
+        assert np.allclose(
+            df[prob_col], df_ref[prob_col], atol=1e-07
+        ), f"Column {prob_col} not allclose at atol=1e-07"
+
+
+def test_cli_run_progress_reports_data_time(tmp_path: Path, tiff_image: Path) -> None:
+    """The inference progress bar reports the time spent waiting on data.
+
+    bear/benchmark_wsinfer.py parses this from stderr to rank runs by throughput and
+    to detect runs that are starved for data.
+    """
+    proc = subprocess.run(
+        [
+            sys.executable,
+            "-m",
+            "wsinfer",
+            "--backend",
+            "tiffslide",
+            "run",
+            "--wsi-dir",
+            str(tiff_image.parent),
+            "--results-dir",
+            str(tmp_path / "inference"),
+            "--model",
+            "breast-tumor-resnet34.tcga-brca",
+        ],
+        capture_output=True,
+        text=True,
+    )
+    assert proc.returncode == 0, proc.stderr
+    assert re.search(r"\d+(?:\.\d+)?(?:it/s|s/it), data_time=\d+\.\d{4}\]", proc.stderr)
+
+
 def test_cli_run_no_model_or_config(tmp_path: Path) -> None:
     """Test that --model or (--config and --model-path) is required."""
     wsi_dir = tmp_path / "slides"
@@ -246,6 +246,21 @@ def _get_info_for_save(
     help="Number of workers to use for data loading during model inference (n=0 for"
     " single thread). Set this to the number of cores on your machine or lower.",
 )
+@click.option(
+    "--pin-memory/--no-pin-memory",
+    default=False,
+    show_default=True,
+    help="Load batches into page-locked memory, which speeds up copies to the GPU."
+    " Only used with CUDA.",
+)
+@click.option(
+    "--prefetch-factor",
+    default=2,
+    show_default=True,
+    type=click.IntRange(min=1),
+    help="Number of batches loaded in advance by each worker. Only used when"
+    " --num-workers > 0.",
+)
 @click.option(
     "--speedup/--no-speedup",
     default=False,
@@ -323,6 +338,8 @@ def run(
     model_path: Path | None,
     batch_size: int,
     num_workers: int = 0,
+    pin_memory: bool = False,
+    prefetch_factor: int = 2,
     speedup: bool = False,
     qupath: bool = False,
     seg_thumbsize: tuple[int, int],
@@ -428,6 +445,8 @@ def run(
         model_info=model_obj,
         batch_size=batch_size,
         num_workers=num_workers,
+        pin_memory=pin_memory,
+        prefetch_factor=prefetch_factor,
         speedup=speedup,
     )
 
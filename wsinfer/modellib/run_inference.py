@@ -8,8 +8,10 @@ From the original paper (https://www.ncbi.nlm.nih.gov/pmc/articles/PMC7369575/):
 from __future__ import annotations
 
 import os
+import time
 from pathlib import Path
 from typing import TYPE_CHECKING
+from typing import Any
 from typing import cast as type_cast
 
 import numpy as np
@@ -34,6 +36,8 @@ def run_inference(
     model_info: wsinfer_zoo.client.HFModelTorchScript | LocalModelTorchScript,
     batch_size: int = 32,
     num_workers: int = 0,
+    pin_memory: bool = False,
+    prefetch_factor: int = 2,
     speedup: bool = False,
 ) -> tuple[list[str], list[str]]:
     """Run model inference on a directory of whole slide images and save results to CSV.
@@ -57,6 +61,12 @@ def run_inference(
         The batch size during the forward pass (default is 32).
     num_workers : int
         Number of workers for data loading (default is 0, meaning use a single thread).
+    pin_memory : bool
+        If True, load batches into page-locked memory, which speeds up copies to the
+        GPU (default False). This is ignored when not using CUDA.
+    prefetch_factor : int
+        Number of batches loaded in advance by each worker (default is 2). This is
+        ignored when `num_workers` is 0.
     speedup : bool
         If True, JIT-compile the model. This has a startup cost but model inference
         should be faster (default False).
@@ -161,19 +171,32 @@ def run_inference(
         if num_workers == 0:
             dset.worker_init()
 
+        # PyTorch raises an error if prefetch_factor is set without workers.
+        loader_kwargs: dict[str, Any] = (
+            {"prefetch_factor": prefetch_factor} if num_workers > 0 else {}
+        )
         loader = torch.utils.data.DataLoader(
             dset,
             batch_size=batch_size,
             shuffle=False,
             num_workers=num_workers,
             worker_init_fn=dset.worker_init,
+            pin_memory=pin_memory and device.type == "cuda",
+            **loader_kwargs,
         )
 
         # Store the coordinates and model probabiltiies of each patch in this slide.
         # This lets us know where the probabiltiies map to in the slide.
         slide_coords: list[npt.NDArray[np.integer]] = []
         slide_probs: list[npt.NDArray[np.floating]] = []
-        for batch_imgs, batch_coords in tqdm.tqdm(loader):
+        progress = tqdm.tqdm(loader)
+        # Time spent waiting on the data loader for each batch. A data_time close to
+        # the time per batch means the model is starved for data.
+        data_start = time.perf_counter()
+        for batch_imgs, batch_coords in progress:
+            progress.set_postfix(
+                data_time=f"{time.perf_counter() - data_start:.4f}", refresh=False
+            )
             assert batch_imgs.shape[0] == batch_coords.shape[0], "length mismatch"
             with torch.no_grad():
                 logits: torch.Tensor = model(batch_imgs.to(device)).detach().cpu()
@@ -187,6 +210,7 @@ def run_inference(
             # error when running wsinfer on a slide in Windows Subsystem for Linux.
             slide_coords.append(batch_coords.clone().numpy())
             slide_probs.append(probs.numpy())
+            data_start = time.perf_counter()
 
         slide_coords_arr = np.concatenate(slide_coords, axis=0)
         slide_df = pd.DataFrame(